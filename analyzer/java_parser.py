@@ -1,6 +1,11 @@
-import javalang
-from typing import List, Dict, Any, Optional, Union
-from javalang.tree import ClassDeclaration, InterfaceDeclaration, EnumDeclaration
+import sys
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple
+
+import tree_sitter_java
+from tree_sitter import Language, Node, Parser
+
+JAVA_LANGUAGE = Language(tree_sitter_java.language())
 
 # Mapping annotation (lowercase) to classification type
 ANNOTATION_CLASS_MAP = {
@@ -19,19 +24,61 @@ ANNOTATION_CLASS_MAP = {
     "log": "Logging"
 }
 
+# Classification labels are interned so every parsed class refers to the same string objects
+ANNOTATION_CLASS_MAP = {anno: sys.intern(label) for anno, label in ANNOTATION_CLASS_MAP.items()}
+ANNOTATION_KEYS = frozenset(ANNOTATION_CLASS_MAP)
+CDI_EVENT = sys.intern("CDI Event")
+CDI_OBSERVER = sys.intern("CDI Observer")
+JSF_MANAGED_BEAN = sys.intern("JSF Managed Bean")
+JSF_VALIDATOR = sys.intern("JSF Validator")
+UNKNOWN_CLASSIFICATION = (sys.intern("Unknown"),)
+# Every label a type can receive; once all are found, members need no further classification
+CLASSIFICATION_COUNT = len(set(ANNOTATION_CLASS_MAP.values()))
 
-def safe_annotation_name(anno) -> Optional[str]:
+# Canonical classification tuples, so types with the same classifications share one object
+_CLASSIFICATIONS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+# Syntax node types of the declarations we extract, mapped to the kind reported for them
+TYPE_DECLARATION_KINDS = {
+    "class_declaration": "ClassDeclaration",
+    "interface_declaration": "InterfaceDeclaration",
+    "enum_declaration": "EnumDeclaration",
+}
+FIELD_NODE_TYPES = ("field_declaration", "constant_declaration")
+ANNOTATION_NODE_TYPES = ("marker_annotation", "annotation")
+
+
+def node_text(node: Node) -> str:
+    """
+    Returns the source text covered by a syntax node.
+    """
+    return node.text.decode("utf-8", errors="replace")
+
+
+def safe_annotation_name(anno: Node) -> Optional[str]:
     """
     Safely get annotation name, returns None if not present.
     """
-    return getattr(anno, "name", None)
+    name = anno.child_by_field_name("name")
+    return node_text(name) if name is not None else None
+
+
+def read_java_source(file_path: str) -> bytes:
+    """
+    Reads a Java source file as raw bytes, which the parser consumes without decoding.
+    """
+    with open(file_path, 'rb') as file:
+        return file.read()
 
 
 class JavaParser:
+    def __init__(self):
+        self._parser = Parser(JAVA_LANGUAGE)
+
     def parse_java_file(self, file_path: str) -> List[Dict[str, Any]]:
         """
         Parses a Java source file and extracts high-level structural information for each top-level class.
-        
+
         Returns a list of dictionaries where each dictionary contains:
             - name: Name of the class
             - annotations: List of annotation names (lowercased)
@@ -44,20 +91,27 @@ class JavaParser:
         """
         parsed_classes = []
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                code = file.read()
-                tree = javalang.parse.parse(code)
-
-            for _, node in tree.filter(javalang.tree.ClassDeclaration):
-                class_info = {
-                    "name": node.name,
-                    "annotations": [a.name.lower() for a in node.annotations],
-                    "fields": self.extract_fields(node),
-                    "methods": self.extract_methods(node),
-                    "type": self.classify_java_component(node),
-                    "nested_types": self.extract_nested_types(node)
-                }
-                parsed_classes.append(class_info)
+            tree = self._parser.parse(read_java_source(file_path))
+            # tree-sitter recovers from syntax errors, so reject partial trees explicitly
+            if tree.root_node.has_error:
+                raise SyntaxError("source contains syntax errors")
+
+            # Every class declaration is reported, including nested ones, as well as
+            # appearing in its enclosing type's nested_types.
+            for type_node in tree.root_node.named_children:
+                if type_node.type not in TYPE_DECLARATION_KINDS:
+                    continue
+                for node, type_info in self.walk_type_declarations(type_node):
+                    if node.type != "class_declaration":
+                        continue
+                    parsed_classes.append({
+                        "name": type_info["name"],
+                        "annotations": type_info["annotations"],
+                        "fields": type_info["fields"],
+                        "methods": type_info["methods"],
+                        "type": type_info["type"],
+                        "nested_types": type_info["nested_types"]
+                    })
 
         except Exception as e:
             print(f"Error parsing {file_path}: {e}")
@@ -65,122 +119,208 @@ class JavaParser:
 
         return parsed_classes
 
-    def extract_nested_types(self, node: Union[ClassDeclaration, InterfaceDeclaration, EnumDeclaration]) -> List[Dict[str, Any]]:
+    def parse_type_declaration(self, node: Node) -> Dict[str, Any]:
         """
-        Extract nested classes, interfaces, or enums inside a given class-like node.
+        Parses a type declaration node into a structured dict including nested types.
         """
-        nested_types = []
-        for inner_node in getattr(node, "body", []):
-            if isinstance(inner_node, (ClassDeclaration, InterfaceDeclaration, EnumDeclaration)):
-                nested_types.append(self.parse_type_declaration(inner_node))
-        return nested_types
+        return self.walk_type_declarations(node)[0][1]
 
-    def parse_type_declaration(self, node: Union[ClassDeclaration, InterfaceDeclaration, EnumDeclaration]) -> Dict[str, Any]:
+    def walk_type_declarations(self, root: Node) -> List[Tuple[Node, Dict[str, Any]]]:
         """
-        Parses a type declaration node into a structured dict including nested types.
+        Visits a type declaration and every type nested inside it exactly once, in source order.
+
+        Returns (node, info) pairs with the root first. Each info dict holds the parsed
+        structure of its node, and its nested_types list holds the infos of its direct children.
+        """
+        declarations = []
+        pending = deque([(root, None)])
+        while pending:
+            node, parent_info = pending.pop()
+            annotations = self._anno_names_lower(node)
+            members = self._member_nodes(node)
+            fields, methods, classifications = self._process_type(node, annotations, members)
+            type_info = {
+                "name": node_text(node.child_by_field_name("name")),
+                "kind": TYPE_DECLARATION_KINDS[node.type],
+                "type": classifications,
+                "annotations": annotations,
+                "modifiers": self._modifier_keywords(node),
+                "fields": fields,
+                "methods": methods,
+                "nested_types": []
+            }
+            if parent_info is not None:
+                parent_info["nested_types"].append(type_info)
+            declarations.append((node, type_info))
+
+            # Push children in reverse so they are popped, and therefore listed, in source order
+            pending.extend(
+                (inner_node, type_info) for inner_node in reversed(members)
+                if inner_node.type in TYPE_DECLARATION_KINDS
+            )
+
+        return declarations
+
+    def _member_nodes(self, node: Node) -> List[Node]:
+        """
+        Returns the member declarations in a type's body; for enums, those following the constants.
         """
-        return {
-            "name": node.name,
-            "kind": type(node).__name__,
-            "type": self.classify_java_component(node),
-            "annotations": [a.name.lower() for a in node.annotations if safe_annotation_name(a)],
-            "modifiers": list(node.modifiers) if hasattr(node, "modifiers") else [],
-            "fields": self.extract_fields(node),
-            "methods": self.extract_methods(node),
-            "nested_types": self.extract_nested_types(node)
-        }
+        body = node.child_by_field_name("body")
+        if body is None:
+            return []
+        if body.type == "enum_body":
+            for child in body.named_children:
+                if child.type == "enum_body_declarations":
+                    return child.named_children
+            return []
+        return body.named_children
 
-    def extract_fields(self, class_node: Union[ClassDeclaration, InterfaceDeclaration, EnumDeclaration]) -> List[Dict[str, Any]]:
+    def _modifiers_node(self, node: Node) -> Optional[Node]:
+        """
+        Returns the modifiers node of a declaration, which holds both keywords and annotations.
+        """
+        for child in node.children:
+            if child.type == "modifiers":
+                return child
+        return None
+
+    def _modifier_keywords(self, node: Node) -> List[str]:
+        """
+        Returns the modifier keywords (public, static, ...) of a declaration in source order.
+        """
+        modifiers = self._modifiers_node(node)
+        if modifiers is None:
+            return []
+        return [child.type for child in modifiers.children if not child.is_named]
+
+    def _anno_names_lower(self, node: Node) -> List[str]:
+        """
+        Returns the lowercased annotation names of a declaration.
+        """
+        modifiers = self._modifiers_node(node)
+        if modifiers is None:
+            return []
+
+        names = []
+        for anno in modifiers.named_children:
+            if anno.type in ANNOTATION_NODE_TYPES:
+                name = safe_annotation_name(anno)
+                if name:
+                    names.append(name.lower())
+        return names
+
+    def extract_fields(self, class_node: Node) -> List[Dict[str, Any]]:
         """
         Extract fields from a class, interface or enum node, including names, types,
         annotations, and modifiers.
         """
-        fields = []
-        for field in getattr(class_node, "fields", []):
-            field_type = self.type_to_str(field.type)
-            field_annotations = [a.name.lower() for a in getattr(field, "annotations", []) if safe_annotation_name(a)]
-            modifiers = list(field.modifiers) if hasattr(field, "modifiers") else []
-            for declarator in field.declarators:
-                fields.append({
-                    "name": declarator.name,
-                    "type": field_type,
-                    "annotations": field_annotations,
-                    "modifiers": modifiers
-                })
-        return fields
+        return self._process_type(class_node)[0]
 
-    def extract_methods(self, class_node: Union[ClassDeclaration, InterfaceDeclaration, EnumDeclaration]) -> List[Dict[str, Any]]:
+    def extract_methods(self, class_node: Node) -> List[Dict[str, Any]]:
         """
         Extract methods from a class, interface or enum node including names,
         annotations, and modifiers.
         """
-        methods = []
-        for method in getattr(class_node, "methods", []):
-            method_annotations = [a.name.lower() for a in getattr(method, "annotations", []) if safe_annotation_name(a)]
-            modifiers = list(method.modifiers) if hasattr(method, "modifiers") else []
-            methods.append({
-                "name": method.name,
-                "annotations": method_annotations,
-                "modifiers": modifiers
-            })
-        return methods
+        return self._process_type(class_node)[1]
 
-    def type_to_str(self, type_obj: Optional[javalang.tree.Type]) -> Optional[str]:
+    def type_to_str(self, type_node: Optional[Node]) -> Optional[str]:
         """
-        Converts a javalang Type object to a string representation including generics.
+        Converts a type syntax node to a string representation including generics,
+        e.g. java.util.List<? extends Foo> or int[].
         """
-        if type_obj is None:
+        if type_node is None:
             return None
 
-        base_name = getattr(type_obj, "name", None)
-        if base_name is None:
-            base_name = str(type_obj)
-
-        # Handle generics, e.g. List<Foo>
-        if hasattr(type_obj, "arguments") and type_obj.arguments:
-            args = []
-            for arg in type_obj.arguments:
-                if hasattr(arg, "type"):
-                    args.append(self.type_to_str(arg.type))
-                else:
-                    args.append(str(arg))
-            base_name += "<" + ",".join(args) + ">"
+        kind = type_node.type
+        if kind == "generic_type":
+            base, arguments = type_node.named_children[0], type_node.named_children[-1]
+            args = [self.type_to_str(arg) for arg in arguments.named_children]
+            return self.type_to_str(base) + "<" + ",".join(args) + ">"
+        if kind == "scoped_type_identifier":
+            return ".".join(self.type_to_str(part) for part in type_node.named_children)
+        if kind == "array_type":
+            dimensions = type_node.child_by_field_name("dimensions")
+            return self.type_to_str(type_node.child_by_field_name("element")) + "[]" * dimensions.text.count(b"[")
+        if kind == "wildcard":
+            return " ".join(self.type_to_str(child) if child.is_named else child.type for child in type_node.children)
+        if kind == "annotated_type":
+            return self.type_to_str(type_node.named_children[-1])
 
-        return base_name
+        return node_text(type_node)
 
-    def classify_java_component(self, node: Union[ClassDeclaration, InterfaceDeclaration, EnumDeclaration]) -> List[str]:
+    def classify_java_component(self, node: Node, annotations: Optional[List[str]] = None) -> Tuple[str, ...]:
         """
         Classifies a type as Entity, Repository, Service, EJB, CDI, JSF Bean, Validator, Logging, etc.
         Supports multiple classifications if multiple annotations are present.
+
+        The node's lowercased annotation names may be passed in when already computed.
+        """
+        return self._process_type(node, annotations)[2]
+
+    def _process_type(
+        self,
+        node: Node,
+        annotations: Optional[List[str]] = None,
+        members: Optional[List[Node]] = None
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Tuple[str, ...]]:
+        """
+        Extracts fields and methods and classifies the type in a single pass over its members.
+
+        Returns (fields, methods, classifications); see extract_fields, extract_methods and
+        classify_java_component for the shape of each.
         """
-        annotations = {a.name.lower() for a in node.annotations if safe_annotation_name(a)}
-        classifications = []
+        if annotations is None:
+            annotations = self._anno_names_lower(node)
+        if members is None:
+            members = self._member_nodes(node)
+
+        # Insertion-ordered dict used as an ordered set of classifications, filled in source order
+        # so the labels come out the same on every run
+        classifications = dict.fromkeys(ANNOTATION_CLASS_MAP[anno] for anno in annotations if anno in ANNOTATION_KEYS)
+        fully_classified = len(classifications) == CLASSIFICATION_COUNT
 
-        for anno in annotations:
-            if anno in ANNOTATION_CLASS_MAP and ANNOTATION_CLASS_MAP[anno] not in classifications:
-                classifications.append(ANNOTATION_CLASS_MAP[anno])
+        fields = []
+        methods = []
+        for member in members:
+            if member.type in FIELD_NODE_TYPES:
+                field_type = self.type_to_str(member.child_by_field_name("type"))
+                field_annotations = self._anno_names_lower(member)
+                modifiers = self._modifier_keywords(member)
+                for declarator in member.children_by_field_name("declarator"):
+                    fields.append({
+                        "name": node_text(declarator.child_by_field_name("name")),
+                        "type": field_type,
+                        "annotations": field_annotations,
+                        "modifiers": modifiers
+                    })
 
-        for field in getattr(node, "fields", []):
-            field_annotations = {a.name.lower() for a in getattr(field, "annotations", []) if safe_annotation_name(a)}
-            for fa in field_annotations:
-                if fa in ANNOTATION_CLASS_MAP and ANNOTATION_CLASS_MAP[fa] not in classifications:
-                    classifications.append(ANNOTATION_CLASS_MAP[fa])
+                if fully_classified:
+                    continue
+                classifications.update(
+                    dict.fromkeys(ANNOTATION_CLASS_MAP[fa] for fa in field_annotations if fa in ANNOTATION_KEYS)
+                )
+                if CDI_EVENT not in classifications and field_type and field_type.startswith("Event"):
+                    classifications[CDI_EVENT] = None
+                fully_classified = len(classifications) == CLASSIFICATION_COUNT
 
-            field_type_name = self.type_to_str(field.type)
-            if field_type_name and field_type_name.startswith("Event") and "CDI Event" not in classifications:
-                classifications.append("CDI Event")
+            elif member.type == "method_declaration":
+                method_annotations = self._anno_names_lower(member)
+                methods.append({
+                    "name": node_text(member.child_by_field_name("name")),
+                    "annotations": method_annotations,
+                    "modifiers": self._modifier_keywords(member)
+                })
 
-        for method in getattr(node, "methods", []):
-            method_annotations = {a.name.lower() for a in getattr(method, "annotations", []) if safe_annotation_name(a)}
-            if "observes" in method_annotations and "CDI Observer" not in classifications:
-                classifications.append("CDI Observer")
+                if CDI_OBSERVER not in classifications and "observes" in method_annotations:
+                    classifications[CDI_OBSERVER] = None
+                    fully_classified = len(classifications) == CLASSIFICATION_COUNT
 
-        if "managedbean" in annotations and "JSF Managed Bean" not in classifications:
-            classifications.append("JSF Managed Bean")
-        if "facesvalidator" in annotations and "JSF Validator" not in classifications:
-            classifications.append("JSF Validator")
+        if "managedbean" in annotations:
+            classifications[JSF_MANAGED_BEAN] = None
+        if "facesvalidator" in annotations:
+            classifications[JSF_VALIDATOR] = None
 
         if not classifications:
-            classifications.append("Unknown")
-
-        return classifications
+            return fields, methods, UNKNOWN_CLASSIFICATION
+        labels = tuple(classifications)
+        return fields, methods, _CLASSIFICATIONS.setdefault(labels, labels)
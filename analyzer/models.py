@@ -0,0 +1,59 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Union
+
+
+@dataclass(slots=True)
+class ParsedField:
+    """
+    A field of a parsed Java class, as read by the LLM stages.
+    """
+    name: str
+    type: str = "unknown"
+
+
+@dataclass(slots=True)
+class ParsedClass:
+    """
+    A parsed Java class reduced to what the LLM stages read: its name, its classification
+    labels joined into one string, and its fields.
+    """
+    name: str
+    type: str = "Unknown"
+    fields: List[ParsedField] = field(default_factory=list)
+
+
+# Parsed class as accepted by the public LLM stage methods: a ParsedClass, or a class
+# dictionary as produced by JavaParser
+ParsedClassLike = Union[ParsedClass, Dict[str, Any]]
+
+
+def classification_label(classifications: Union[str, Iterable[str], None]) -> str:
+    """
+    Joins a type's classification labels into the single string stored on ParsedClass.
+    """
+    if not classifications:
+        return "Unknown"
+    if isinstance(classifications, str):
+        return classifications
+    return ", ".join(classifications)
+
+
+def coerce_parsed_classes(parsed_classes: Iterable[ParsedClassLike]) -> List[ParsedClass]:
+    """
+    Converts class dictionaries to ParsedClass, passing ParsedClass instances through unchanged.
+    A list holding only ParsedClass instances is returned as it is, so summaries of it are reused.
+    """
+    if isinstance(parsed_classes, list) and all(isinstance(cls, ParsedClass) for cls in parsed_classes):
+        return parsed_classes
+
+    coerced = []
+    for cls in parsed_classes:
+        if isinstance(cls, ParsedClass):
+            coerced.append(cls)
+            continue
+        coerced.append(ParsedClass(
+            name=cls.get("name", "Unknown"),
+            type=classification_label(cls.get("type")),
+            fields=[ParsedField(f["name"], f.get("type") or "unknown") for f in cls.get("fields", [])]
+        ))
+    return coerced
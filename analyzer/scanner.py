@@ -6,6 +6,9 @@ import logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Tooling and VCS directories that never hold Java sources; not descended into
+SKIPPED_DIRS = {".git", ".hg", ".svn", ".idea", "node_modules"}
+
 def find_java_files(root_dir: str) -> List[str]:
     """
     Recursively find all Java source files under the root directory.
@@ -23,8 +26,20 @@ def find_java_files(root_dir: str) -> List[str]:
         logger.error(f"Provided path is not a valid directory: {root_dir}")
         return java_files
 
-    for path in root_path.rglob("*.java"):
-        java_files.append(str(path))
+    # Iterative walk over os.scandir entries, which cache their type and avoid building Path objects
+    pending = [str(root_path)]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIPPED_DIRS:
+                            pending.append(entry.path)
+                    elif entry.name.endswith(".java"):
+                        java_files.append(entry.path)
+        except OSError as e:
+            logger.warning(f"Skipping unreadable directory {directory}: {e}")
 
     return java_files
 
@@ -38,8 +53,8 @@ def main():
     root = sys.argv[1]
     files = find_java_files(root)
     logger.info(f"Found {len(files)} Java files:")
-    for f in files:
-        print(f)
+    if files:
+        sys.stdout.write("\n".join(files) + "\n")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+from analyzer.models import ParsedClass
+
+# The parsed classes each summary format was last built for, with the summary. The same list of
+# parsed classes flows through every pipeline stage, so each format is built once per run.
+_SUMMARY_CACHE: Dict[str, Tuple[List[ParsedClass], str]] = {}
+
+# Leads the compact fields summary so the LLM can read it; the summary sits in the cached
+# prompt prefix, so the header costs its tokens once rather than "Class:"/"Fields:" per class
+FIELDS_SUMMARY_HEADER = (
+    "FORMAT: one class per line as ClassName|field:type,field:type (nothing after | means no fields); "
+    "a line starting with a bracketed list, [ClassA, ClassB]|field:type,field:type, stands for several "
+    "classes that each have exactly those fields"
+)
+
+
+def _cached_summary(parsed_classes: List[ParsedClass], build: Callable[[List[ParsedClass]], str]) -> str:
+    """
+    Returns the summary produced by build for the parsed classes, reusing the last result while
+    the same list is summarized again, so the list must not be modified in between.
+    """
+    cached = _SUMMARY_CACHE.get(build.__name__)
+    if cached is not None and cached[0] is parsed_classes:
+        return cached[1]
+
+    summary = build(parsed_classes)
+    _SUMMARY_CACHE[build.__name__] = (parsed_classes, summary)
+    return summary
+
+
+def _build_fields_summary(parsed_classes: List[ParsedClass]) -> str:
+    # Group structurally identical classes, such as generated DTOs, by their sorted fields;
+    # each group is listed once, where its first member appears. Classes without fields share
+    # nothing meaningful, so each keeps its own line, keyed by its position
+    groups = defaultdict(list)
+    for i, cls in enumerate(parsed_classes):
+        groups[tuple(sorted((f.name, f.type) for f in cls.fields)) or i].append(cls)
+
+    lines = [FIELDS_SUMMARY_HEADER]
+    for members in groups.values():
+        fields = ",".join(f"{f.name}:{f.type}" for f in members[0].fields)
+        if len(members) == 1:
+            lines.append(members[0].name + "|" + fields)
+        else:
+            lines.append("[" + ", ".join(cls.name for cls in members) + "]|" + fields)
+    return "\n".join(lines)
+
+
+def _build_details_summary(parsed_classes: List[ParsedClass]) -> str:
+    lines = []
+    for cls in parsed_classes:
+        lines.append(f"Class: {cls.name} ({cls.type})")
+        for f in cls.fields:
+            lines.append(f"  - {f.name}: {f.type}")
+    return "\n".join(lines)
+
+
+def fields_summary(parsed_classes: List[ParsedClass]) -> str:
+    """
+    Summarizes parsed classes compactly, one per line as "Name|name:type,name:type", after a
+    header line describing the format. Classes with the same, non-empty fields share one line,
+    as "[NameA, NameB]|name:type,name:type".
+    """
+    return _cached_summary(parsed_classes, _build_fields_summary)
+
+
+def details_summary(parsed_classes: List[ParsedClass], cache: bool = True) -> str:
+    """
+    Summarizes parsed classes with their classification, as "Class: Name (type)" followed by
+    one "  - name: type" line per field. Pass cache=False for one-off summaries, such as of
+    part of the classes, so they do not displace the cached summaries.
+    """
+    if not cache:
+        return _build_details_summary(parsed_classes)
+    return _cached_summary(parsed_classes, _build_details_summary)
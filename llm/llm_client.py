@@ -1,26 +1,48 @@
+import atexit
+import contextlib
+import hashlib
+import importlib.util
+import json
 import os
-from typing import List, Dict, Optional
+from typing import AsyncIterator, Callable, Iterator, List, Dict, Optional, Any
 from dotenv import load_dotenv
+import httpx
 import openai
 import logging
 
+from llm.response_cache import PromptResponseCache
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Connection pool settings shared by the sync and async clients; keep-alive connections
+# let successive requests in a pipeline run reuse the same TLS session
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=8, max_connections=16)
+HTTP_TIMEOUT = httpx.Timeout(60.0)
+# HTTP/2 multiplexes concurrent requests over one connection; it needs the h2 package
+# (installed by httpx[http2]), and HTTP/1.1 is used without it
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Completions are cached on disk by a hash of the request; set LLM_CACHE_DIR to an empty
+# string to disable. Sampled (high temperature) requests are never cached.
+DEFAULT_CACHE_DIR = "~/.cache/java-mongo-migrator/llm"
+CACHE_MAX_TEMPERATURE = 0.3
+
 class LLMClient:
     """
     A simple OpenAI LLM client wrapper for chat completions.
     """
 
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None, force_refresh: bool = False):
         """
         Initialize the LLM client.
 
         Args:
             api_key (Optional[str]): OpenAI API key. If None, reads from environment variable OPENAI_API_KEY.
             model (Optional[str]): The OpenAI model to use. If None, reads from environment variable OPENAI_MODEL or defaults to "gpt-4-turbo".
+            force_refresh (bool): If True, cached responses are ignored; fresh responses are still cached.
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
@@ -28,7 +50,21 @@ class LLMClient:
 
         self.model = model or os.getenv("OPENAI_MODEL", "gpt-4-turbo")
 
-        openai.api_key = self.api_key
+        self._client = openai.OpenAI(
+            api_key=self.api_key,
+            http_client=httpx.Client(http2=HTTP2, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+        )
+        atexit.register(self._client.close)
+        # Created on first async request so it binds to the running event loop
+        self._async_client: Optional[openai.AsyncOpenAI] = None
+
+        cache_dir = os.getenv("LLM_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.cache = PromptResponseCache(self.cache_dir) if self.cache_dir else None
+        self.force_refresh = force_refresh
+        # Set PROMPT_CACHE_ROUTING to 0, false, no or an empty string for OpenAI-compatible servers
+        # that reject unknown fields
+        self.prompt_cache_routing = os.getenv("PROMPT_CACHE_ROUTING", "1").strip().lower() not in ("", "0", "false", "no")
         logger.info(f"Initialized LLMClient with model '{self.model}'")
 
     def chat_completion(
@@ -40,6 +76,8 @@ class LLMClient:
         frequency_penalty: float = 0.2,  # Light penalty to reduce repetition
         presence_penalty: float = 0.0,  # No penalty for introducing new topics
         stop: Optional[List[str]] = None,  # Add if you need clean truncation
+        model: Optional[str] = None,  # Overrides the client's model for this request
+        cacheable: Optional[Callable[[str], bool]] = None,  # Rejects replies that must not be cached
     ) -> str:
         """
         Send a chat completion request to OpenAI API.
@@ -52,43 +90,287 @@ class LLMClient:
             frequency_penalty (float): Frequency penalty.
             presence_penalty (float): Presence penalty.
             stop (Optional[List[str]]): List of stop sequences.
+            model (Optional[str]): Model to use instead of the client's model, e.g. a smaller one.
+            cacheable (Optional[Callable[[str], bool]]): Returns whether a reply may be cached, e.g.
+                False for a malformed one, which is then neither stored nor served from the cache.
 
         Returns:
             str: The assistant's reply.
         """
-        try:
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p,
-                frequency_penalty=frequency_penalty,
-                presence_penalty=presence_penalty,
-                stop=stop,
+        self._check_messages(messages)
+        params = self._request_params(temperature, max_tokens, top_p, frequency_penalty, presence_penalty, stop, model)
+        cache_key = self._cache_key(messages, params)
+        cached = self._cache_get(cache_key, cacheable)
+        if cached is not None:
+            return cached
+
+        with self._logged_errors():
+            response = self._client.chat.completions.create(
+                messages=messages, extra_body=self._extra_body(messages), **params
             )
-            assistant_message = response.choices[0].message.content.strip()
-            logger.debug(f"OpenAI response: {assistant_message}")
-            return assistant_message
+            return self._reply(response, cache_key, cacheable)
 
-        except openai.error.OpenAIError as e:
+    async def achat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.1,
+        max_tokens: Optional[int] = 4096,
+        top_p: float = 1.0,
+        frequency_penalty: float = 0.2,
+        presence_penalty: float = 0.0,
+        stop: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        cacheable: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        Async variant of chat_completion, allowing independent requests to be in flight together.
+
+        Args:
+            See chat_completion.
+
+        Returns:
+            str: The assistant's reply.
+        """
+        self._check_messages(messages)
+        params = self._request_params(temperature, max_tokens, top_p, frequency_penalty, presence_penalty, stop, model)
+        cache_key = self._cache_key(messages, params)
+        cached = self._cache_get(cache_key, cacheable)
+        if cached is not None:
+            return cached
+
+        with self._logged_errors():
+            response = await self._get_async_client().chat.completions.create(
+                messages=messages, extra_body=self._extra_body(messages), **params
+            )
+            return self._reply(response, cache_key, cacheable)
+
+    def chat_completion_stream(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """
+        Streaming variant of chat_completion, yielding the reply in pieces as it is generated.
+        Accepts the same sampling parameters. Cached replies are yielded whole.
+        """
+        self._check_messages(messages)
+        params = self._request_params(**kwargs)
+        cache_key = self._cache_key(messages, params)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        pieces = []
+        with self._logged_errors():
+            stream = self._client.chat.completions.create(
+                messages=messages, stream=True, extra_body=self._extra_body(messages), **params
+            )
+            for chunk in stream:
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+
+        self._cache_put(cache_key, "".join(pieces).strip())
+
+    async def achat_completion_stream(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """
+        Async variant of chat_completion_stream.
+        """
+        self._check_messages(messages)
+        params = self._request_params(**kwargs)
+        cache_key = self._cache_key(messages, params)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        pieces = []
+        with self._logged_errors():
+            stream = await self._get_async_client().chat.completions.create(
+                messages=messages, stream=True, extra_body=self._extra_body(messages), **params
+            )
+            async for chunk in stream:
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+
+        self._cache_put(cache_key, "".join(pieces).strip())
+
+    def _request_params(
+        self,
+        temperature: float = 0.1,
+        max_tokens: Optional[int] = 4096,
+        top_p: float = 1.0,
+        frequency_penalty: float = 0.2,
+        presence_penalty: float = 0.0,
+        stop: Optional[List[str]] = None,
+        model: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Collects the model and sampling parameters of a request, with chat_completion's defaults.
+        """
+        return {
+            "model": model or self.model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "top_p": top_p,
+            "frequency_penalty": frequency_penalty,
+            "presence_penalty": presence_penalty,
+            "stop": stop,
+        }
+
+    def _check_messages(self, messages: List[Dict[str, str]]) -> None:
+        """
+        Rejects a bare prompt string passed where a list of message dicts is expected.
+        """
+        if isinstance(messages, str):
+            raise TypeError("Expected a list of message dicts; use generate() to send a single prompt string.")
+
+    def _reply(self, response: Any, cache_key: Optional[str], cacheable: Optional[Callable[[str], bool]]) -> str:
+        """
+        Returns the assistant's reply from a completion response, caching it under the request's key.
+        """
+        assistant_message = response.choices[0].message.content.strip()
+        logger.debug(f"OpenAI response: {assistant_message}")
+        self._cache_put(cache_key, assistant_message, cacheable)
+        return assistant_message
+
+    @contextlib.contextmanager
+    def _logged_errors(self) -> Iterator[None]:
+        """
+        Logs an error raised while a request is made or its response is read, then re-raises it.
+        """
+        try:
+            yield
+        except openai.OpenAIError as e:
             logger.error(f"OpenAI API error: {e}")
             raise
-
         except Exception as e:
             logger.error(f"Unexpected error in LLMClient: {e}")
             raise
 
-    def generate(self, prompt: str, **kwargs) -> str:
+    def _extra_body(self, messages: List[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        """
+        Returns the provider-specific request fields. Requests that lead with a system message get
+        a prompt_cache_key derived from it, so requests sharing that prefix are routed to the same
+        prompt cache and reuse its tokenized, prefilled prefix.
+        """
+        if not self.prompt_cache_routing or not messages or messages[0]["role"] != "system":
+            return None
+        digest = hashlib.blake2b(messages[0]["content"].encode("utf-8"), digest_size=16).hexdigest()
+        return {"prompt_cache_key": digest}
+
+    def _get_async_client(self) -> openai.AsyncOpenAI:
+        """
+        Returns the async client, creating it on first use so it binds to the running event loop.
+        """
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                http_client=httpx.AsyncClient(http2=HTTP2, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+            )
+        return self._async_client
+
+    async def aclose(self) -> None:
+        """
+        Closes the async client's connections. Call before the event loop it was used on ends.
+        """
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    def _cache_key(self, messages: List[Dict[str, str]], params: Dict[str, Any]) -> Optional[str]:
+        """
+        Returns the cache key identifying the request, or None if the request should not be cached.
+        """
+        if self.cache is None or params["temperature"] > CACHE_MAX_TEMPERATURE:
+            return None
+
+        return self.cache.key(json.dumps({"messages": messages, **params}, sort_keys=True))
+
+    def _cache_get(
+        self,
+        cache_key: Optional[str],
+        cacheable: Optional[Callable[[str], bool]] = None
+    ) -> Optional[str]:
+        """
+        Returns the cached completion for a request, unless caching is off, a refresh was requested
+        or cacheable rejects the cached completion.
+        """
+        if cache_key is None or self.force_refresh:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is not None and cacheable is not None and not cacheable(cached):
+            logger.warning(f"Ignoring rejected LLM cache entry: {cache_key}")
+            return None
+        return cached
+
+    def _cache_put(
+        self,
+        cache_key: Optional[str],
+        completion: str,
+        cacheable: Optional[Callable[[str], bool]] = None
+    ) -> None:
+        """
+        Stores a completion under its request's cache key, unless cacheable rejects it.
+        """
+        if cache_key is not None and (cacheable is None or cacheable(completion)):
+            self.cache.put(cache_key, completion)
+
+    def generate(self, prompt: str, system: Optional[str] = None, **kwargs) -> str:
         """
         Convenience method to generate a completion from a single prompt string.
 
         Args:
             prompt (str): The prompt to send to the LLM.
+            system (Optional[str]): Optional system message sent ahead of the prompt. Content that
+                is identical across requests belongs here, so the provider can reuse its cached
+                prefix instead of processing those tokens again.
             **kwargs: Additional parameters to pass to chat_completion.
 
         Returns:
             str: The assistant's reply.
         """
+        return self.chat_completion(self._messages(prompt, system), **kwargs)
+
+    async def agenerate(self, prompt: str, system: Optional[str] = None, **kwargs) -> str:
+        """
+        Async variant of generate.
+
+        Args:
+            prompt (str): The prompt to send to the LLM.
+            system (Optional[str]): Optional system message sent ahead of the prompt.
+            **kwargs: Additional parameters to pass to achat_completion.
+
+        Returns:
+            str: The assistant's reply.
+        """
+        return await self.achat_completion(self._messages(prompt, system), **kwargs)
+
+    def generate_stream(self, prompt: str, system: Optional[str] = None, **kwargs) -> Iterator[str]:
+        """
+        Streaming variant of generate, yielding the reply in pieces as it is generated.
+
+        Args:
+            prompt (str): The prompt to send to the LLM.
+            system (Optional[str]): Optional system message sent ahead of the prompt.
+            **kwargs: Additional parameters to pass to chat_completion_stream.
+
+        Returns:
+            Iterator[str]: Pieces of the assistant's reply.
+        """
+        return self.chat_completion_stream(self._messages(prompt, system), **kwargs)
+
+    def agenerate_stream(self, prompt: str, system: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+        """
+        Async variant of generate_stream.
+        """
+        return self.achat_completion_stream(self._messages(prompt, system), **kwargs)
+
+    def _messages(self, prompt: str, system: Optional[str]) -> List[Dict[str, str]]:
+        """
+        Builds the message list for a prompt and optional system message.
+        """
         messages = [{"role": "user", "content": prompt}]
-        return self.chat_completion(messages, **kwargs)
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        return messages
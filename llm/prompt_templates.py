@@ -1,4 +1,37 @@
-MIGRATION_PLAN_PROMPT = """
+from string import Formatter
+from typing import List, Optional, Tuple
+
+
+class PromptTemplate:
+    """
+    A prompt template whose placeholders are located once, when the template is defined.
+
+    format() accepts the same keyword arguments as str.format but only joins the
+    pre-split literal segments with the substituted values, instead of re-scanning the
+    whole template on every call. Unused keyword arguments are ignored, as with str.format.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self._segments: List[Tuple[str, Optional[str]]] = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(template):
+            if format_spec or conversion:
+                raise ValueError(f"Unsupported format spec or conversion for field '{field_name}'")
+            self._segments.append((literal, field_name))
+
+    def format(self, **variables) -> str:
+        """
+        Renders the template with the given placeholder values.
+        """
+        parts = []
+        for literal, field_name in self._segments:
+            parts.append(literal)
+            if field_name is not None:
+                parts.append(str(variables[field_name]))
+        return "".join(parts)
+
+
+MIGRATION_PLAN_PROMPT = PromptTemplate("""
 You are an expert Java engineer specializing in migrating legacy Java applications 
 (from various frameworks such as Java EE, JBoss, monoliths, or custom frameworks) 
 to modern Spring Boot applications using Java 21 and MongoDB.
@@ -52,10 +85,10 @@ Think through each step carefully to cover all relevant aspects and avoid missin
 
 Static code analysis summary:
 {static_analysis}
-"""
+""")
 
 
-SCHEMA_SUGGESTION_PROMPT = """
+SCHEMA_SUGGESTION_PROMPT = PromptTemplate("""
 You are a top-tier database architect and MongoDB expert with extensive experience 
 in translating complex Java domain models from legacy applications into scalable, high-performance, and maintainable MongoDB schema designs.
 
@@ -81,9 +114,46 @@ Think carefully and provide detailed, actionable insights. Include examples wher
 
 Static analysis summary:
 {static_analysis}
-"""
+""")
+
+CLASS_GROUP_SUMMARY_PROMPT = PromptTemplate("""
+You are assisting with planning the migration of a legacy Java application to Spring Boot with MongoDB.
+
+Below is the static code analysis of one group of the application's classes. Condense it into a brief
+summary of at most about 300 words that keeps, for every class, its name, its role (entity, service,
+repository, event, validator, ...), the fields that matter for persistence, and its relationships to
+other classes. Leave out everything else and do not add recommendations.
+
+Static code analysis:
+{static_analysis}
+""")
+
+SCHEMA_SUGGESTION_REQUEST = "Generate the MongoDB schema proposal for the domain model summarized above."
+
+PLAN_REQUEST = "Generate the migration plan for the application summarized above."
+
+PLAN_SCHEMA_SUGGESTION_PROMPT = PromptTemplate("""
+MongoDB Schema Suggestion:
+{schema_suggestion}
+
+Generate the migration plan for the application summarized above, consistent with this schema suggestion.
+""")
+
+PLAN_SCHEMA_RECONCILE_PROMPT = PromptTemplate("""
+The migration plan below was drafted from the application summarized above before its MongoDB schema was settled.
+
+### Draft Migration Plan:
+{migration_plan}
+
+### MongoDB Schema Suggestion:
+{schema_suggestion}
 
-VALIDATION_PROMPT_TEMPLATE = """
+Revise the migration plan so that its collections, document structure, and migration steps are consistent with this schema suggestion, keeping everything else it covers.
+
+Respond **only** with the revised migration plan text.
+""")
+
+VALIDATION_PROMPT_TEMPLATE = PromptTemplate("""
 You are a highly experienced software engineering assistant specializing in validating migration plans for legacy Java applications migrating to modern Spring Boot applications with MongoDB.
 
 Given the following migration plan and metadata extracted from the Java source code, perform a detailed, critical review of the plan’s completeness, correctness, and feasibility.
@@ -124,29 +194,35 @@ Important instructions for your response:
 - Ensure the JSON is syntactically valid and parsable.
 
 Your goal is to help ensure the migration plan is robust, accurate, and practical for implementation.
-"""
+""")
 
-SCHEMA_REVISION_PROMPT = """
+SCHEMA_REVISION_PROMPT = PromptTemplate("""
 You are a seasoned Java engineer and database migration specialist focused on migrating legacy Java applications
 to modern Spring Boot applications using Java 21 and MongoDB.
 
-The previously generated MongoDB schema suggestion has been reviewed and contains the following issues or omissions:
-{issues}
+Static code analysis summary:
+{static_analysis}
 
-Using the static code analysis summary provided below, revise the schema suggestion to address these issues.
-Ensure the revised schema:
+You will be given a previously generated MongoDB schema suggestion together with the issues or omissions
+found when it was reviewed. Using the static code analysis summary above, revise the schema suggestion to
+address these issues. Ensure the revised schema:
 - Accurately reflects all relevant classes and their relationships
 - Includes proper field definitions with appropriate types
 - Adheres to MongoDB best practices for document design
 - Accounts for transaction management and data consistency considerations
+""")
 
-Static code analysis summary:
-{static_analysis}
+SCHEMA_REVISION_FEEDBACK_PROMPT = PromptTemplate("""
+Previously generated schema suggestion:
+{original_schema}
+
+Issues or omissions found in review:
+{issues}
 
 Please provide the corrected and improved MongoDB schema suggestion.
-"""
+""")
 
-PLAN_REVISION_FEEDBACK_PROMPT = """
+PLAN_REVISION_FEEDBACK_PROMPT = PromptTemplate("""
 You are a senior AI assistant specializing in software migration planning.
 
 Below is a migration plan you previously generated, intended to help migrate Java classes and their data structure to a MongoDB schema. You have also received detailed validation feedback pointing out problems, inconsistencies, or missing information.
@@ -174,4 +250,11 @@ Please produce a fully revised migration plan that incorporates this feedback an
 
 Respond **only** with the revised migration plan text. Do not include explanations or apologies.
 
+""")
+
+PLAN_SELF_CHECK_INSTRUCTION = """
+
+After the plan, add one final line by itself of the form `SELF_CHECK: <score>`, where <score> is an
+integer from 0 to 100 rating how completely and correctly the plan covers every class, field, and
+concern in the static code analysis summary. Be conservative; do not score above 90 unless nothing is missing.
 """
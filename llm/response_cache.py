@@ -0,0 +1,62 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PromptResponseCache:
+    """
+    An on-disk cache of LLM responses, stored one file per entry and keyed by a SHA-256
+    digest of the request.
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        Initialize the cache. The directory is created on the first write.
+        """
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def key(request: str) -> str:
+        """
+        Returns the cache key for a serialized request.
+        """
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached response for a key, or None if there is no readable entry.
+        """
+        try:
+            with open(os.path.join(self.cache_dir, key), "r", encoding="utf-8") as f:
+                cached = f.read()
+        except (OSError, UnicodeDecodeError):
+            # A missing entry is a plain miss; a corrupt one is overwritten by the next put
+            return None
+
+        logger.debug(f"LLM cache hit: {key}")
+        return cached
+
+    def put(self, key: str, value: str) -> None:
+        """
+        Stores a response under a key. Failures are logged and otherwise ignored.
+        """
+        tmp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file first so concurrent readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, os.path.join(self.cache_dir, key))
+        except (OSError, UnicodeEncodeError) as e:
+            logger.warning(f"Failed to write LLM cache entry: {e}")
+            # Remove the partial temporary file, if it was created and not yet renamed into place
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
@@ -1,11 +1,16 @@
 import argparse
+import asyncio
+import itertools
 import logging
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from typing import Optional
 
 from analyzer.scanner import find_java_files
 from analyzer.java_parser import JavaParser
+from analyzer.models import ParsedClass, ParsedField, classification_label
 from migration_plan.plan_generator import MigrationPlanGenerator
 from migration_plan.plan_validator import MigrationPlanValidator
 from schema_inference.schema_suggester import SchemaSuggester
@@ -15,37 +20,217 @@ from llm.llm_client import LLMClient
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Below this many files, process start-up costs more than parsing serially
+PARALLEL_PARSE_MIN_FILES = 16
 
-def parse_java_source(path: str):
+# Parser reused for every file handled by this process, created on first use
+_java_parser = None
+
+# Sampling temperature for plan revision candidates when several are requested per attempt,
+# so they differ from one another (and are not served from the response cache)
+CANDIDATE_TEMPERATURE = 0.7
+
+
+def _env_flag(name: str) -> bool:
+    """
+    Reads an on/off environment variable; unset, empty, 0, false and no mean off.
+    """
+    return os.getenv(name, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def _int_setting(
+    name: str,
+    default: Optional[int],
+    low: Optional[int] = None,
+    high: Optional[int] = None
+) -> Optional[int]:
+    """
+    Reads an integer environment variable, returning default when it is unset or empty.
+    Raises ValueError if the value is not an integer within the optional bounds.
+    """
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}") from None
+    if low is not None and number < low:
+        raise ValueError(f"{name} must be at least {low}, got {number}")
+    if high is not None and number > high:
+        raise ValueError(f"{name} must be at most {high}, got {number}")
+    return number
+
+
+def _parse_file(file_path: str):
+    """
+    Parses a single Java file, logging and skipping it on failure.
+    Module-level so it can be dispatched to worker processes.
+    """
+    global _java_parser
+    if _java_parser is None:
+        _java_parser = JavaParser()
+
+    try:
+        return _java_parser.parse_java_file(file_path)
+    except Exception as e:
+        logger.error(f"Failed to parse {file_path}: {e}")
+        return []
+
+
+def _parse_file_compact(file_path: str):
+    """
+    Parses a single Java file and reduces its classes with _compact_class, so worker processes
+    send back compact objects instead of the full parse tree dictionaries. Error entries are
+    passed through for compact_parsed_classes to count.
+    """
+    return [cls if "error" in cls else _compact_class(cls) for cls in _parse_file(file_path)]
+
+
+def _write_result(path: str, content: str) -> None:
+    """
+    Writes a result file with unbuffered OS writes, fsyncing it when FSYNC_RESULTS is on.
+    """
+    data = memoryview(content.encode("utf-8"))
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while data:
+            written = os.write(fd, data)
+            data = data[written:]
+        if _env_flag("FSYNC_RESULTS"):
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def parse_java_source(path: str, compact: bool = False, max_workers: Optional[int] = None):
     """
     Recursively finds and parses Java files in the given path.
+    Files are parsed across a process pool unless there are only a few of them.
 
     Args:
         path: Root directory of Java source code.
+        compact: Reduce each class to a ParsedClass as it is parsed, before it leaves the
+            worker process; entries for files that failed to parse are kept as they are.
+        max_workers: Number of parsing processes, by default one per CPU; with 1, files are
+            parsed serially in this process.
 
     Returns:
-        A list of parsed Java class dictionaries extracted from the source files.
+        A list of parsed Java class dictionaries extracted from the source files, or of
+        ParsedClass instances if compact is set.
     """
 
+    parse = _parse_file_compact if compact else _parse_file
     files = find_java_files(path)
-    parser = JavaParser()
-    parsed_classes = []
-    for file_path in files:
-        try:
-            parsed = parser.parse_java_file(file_path)
-            parsed_classes.extend(parsed)
-        except Exception as e:
-            logger.error(f"Failed to parse {file_path}: {e}")
-    return parsed_classes
+    max_workers = max_workers or os.cpu_count() or 1
+    if len(files) < PARALLEL_PARSE_MIN_FILES or max_workers == 1:
+        results = map(parse, files)
+        return list(itertools.chain.from_iterable(results))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(parse, files, chunksize=8)
+        return list(itertools.chain.from_iterable(results))
+
+
+async def _bounded(semaphore: asyncio.Semaphore, coro):
+    """
+    Awaits a coroutine while holding the semaphore that caps concurrent LLM requests.
+    """
+    async with semaphore:
+        return await coro
+
+
+async def _echo_stream(chunks):
+    """
+    Passes streamed LLM output through unchanged, writing each piece to stdout as it arrives.
+    """
+    async for chunk in chunks:
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+        yield chunk
+    sys.stdout.write("\n")
+
+
+async def _first_valid_plan(candidates, plan_validator, parsed_classes, semaphore):
+    """
+    Validates candidate plans concurrently and returns the first (plan, report) found valid,
+    cancelling the remaining validations. Falls back to the first candidate if none is valid.
+    """
+    tasks = [
+        asyncio.create_task(_bounded(semaphore, plan_validator.avalidate_plan(candidate, parsed_classes)))
+        for candidate in candidates
+    ]
+    task_indexes = {task: i for i, task in enumerate(tasks)}
+    reports = [None] * len(tasks)
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                i = task_indexes[task]
+                reports[i] = task.result()
+                if reports[i].get("valid", False):
+                    return candidates[i], reports[i]
+    finally:
+        for task in pending:
+            task.cancel()
 
+    return candidates[0], reports[0]
 
-def full_migrate_command(path: str) -> None:
+
+def compact_parsed_classes(parsed_classes):
+    """
+    Reduces parsed classes to the parts the LLM stages read: the class name, its
+    classification and the name and type of each field. Entries for files that failed
+    to parse are dropped rather than being summarized as anonymous classes.
+
+    Args:
+        parsed_classes: Parsed Java classes as returned by parse_java_source; classes already
+            compacted there are kept as they are.
+
+    Returns:
+        A list of ParsedClass instances.
+    """
+    compact_classes = []
+    failed = 0
+    for cls in parsed_classes:
+        if isinstance(cls, ParsedClass):
+            compact_classes.append(cls)
+        elif "error" in cls:
+            failed += 1
+        else:
+            compact_classes.append(_compact_class(cls))
+
+    if failed:
+        logger.warning(f"Skipping {failed} Java files that could not be parsed")
+    return compact_classes
+
+
+def _compact_class(cls) -> ParsedClass:
+    """
+    Reduces one parsed class dictionary to a ParsedClass.
+    """
+    return ParsedClass(
+        name=cls["name"],
+        type=classification_label(cls["type"]),
+        fields=[ParsedField(f["name"], f["type"] or "unknown") for f in cls["fields"]]
+    )
+
+
+async def full_migrate_command(
+    path: str,
+    force_refresh: bool = False,
+    result_prefix: str = "",
+    parse_workers: Optional[int] = None,
+    echo: bool = True
+) -> None:
     """
     Executes the full migration pipeline from Java source to a MongoDB-compatible schema and migration plan.
+    LLM requests are awaited so that independent calls can share the event loop.
 
     Steps:
         1. Parse Java source code.
-        2. Suggest MongoDB schema using LLM.
+        2. Suggest MongoDB schema using LLM, streaming it and checking it as it arrives.
         3. Validate and optionally revise the schema.
         4. Generate a migration plan.
         5. Validate and revise the plan up to MAX_RETRIES.
@@ -53,126 +238,258 @@ def full_migrate_command(path: str) -> None:
 
     Args:
         path: Root directory containing the Java source code.
+        force_refresh: Ignore cached LLM responses instead of reusing them.
+        result_prefix: Prepended to the saved result file names, e.g. to tell projects apart.
+        parse_workers: Number of processes to parse the Java files with; see parse_java_source.
+        echo: Print the schema suggestion as it streams in; otherwise it is printed once complete,
+            so output from projects migrated side by side does not interleave mid-schema.
     """
 
     logger.info(f"Starting full migration pipeline for path: {path}")
 
+    # Settings are read before any work, so an invalid value fails before LLM requests are paid for.
+    # With PLAN_SELF_CHECK_THRESHOLD set, the generator also scores its own plan (0-100) and a
+    # score at or above the threshold stands in for the first validation round-trip.
+    try:
+        max_concurrency = _int_setting("LLM_MAX_CONCURRENCY", 4, low=1)
+        max_retries = _int_setting("MAX_RETRIES", 3)
+        candidates_per_attempt = max(1, _int_setting("PLAN_REVISION_CANDIDATES", 1))
+        schema_candidates = max(1, _int_setting("SCHEMA_REVISION_CANDIDATES", 1))
+        self_check_threshold = _int_setting("PLAN_SELF_CHECK_THRESHOLD", None, low=0, high=100)
+    except ValueError as e:
+        logger.error(f"Invalid setting: {e}; aborting.")
+        sys.exit(1)
+
     files = find_java_files(path)
     if not files:
         logger.error("No Java files found; aborting.")
         sys.exit(1)
     logger.info(f"Found {len(files)} Java files")
 
-    parsed_classes = parse_java_source(path)
+    parsed_classes = compact_parsed_classes(parse_java_source(path, compact=True, max_workers=parse_workers))
+    if not parsed_classes:
+        logger.error("No Java classes could be parsed; aborting.")
+        sys.exit(1)
     logger.info(f"Parsed {len(parsed_classes)} Java classes")
 
-    llm_client = LLMClient()
-
-    # Step 1: Suggest schema
+    llm_client = LLMClient(force_refresh=force_refresh)
+    semaphore = asyncio.Semaphore(max_concurrency)
     suggester = SchemaSuggester(llm_client)
-    schema_suggestion = suggester.suggest_schema(parsed_classes)
-    print("\n=== Schema Suggestion ===")
-    print(schema_suggestion)
-
-    # Step 2: Validate schema suggestion
+    # The plan generator bounds each of its requests, such as group condensation, by the semaphore
+    plan_generator = MigrationPlanGenerator(llm_client, semaphore=semaphore)
+
+    async def draft_plan(schema_suggestion=None):
+        """Generates the migration plan, returning it with its self-check score (or None)."""
+        if self_check_threshold is not None:
+            return await plan_generator.agenerate_plan_with_self_check(
+                parsed_classes, schema_suggestion=schema_suggestion
+            )
+        return await plan_generator.agenerate_plan(parsed_classes, schema_suggestion=schema_suggestion), None
+
+    # Steps 1 and 2: Suggest schema, printing it as it streams in, and validate it on the fly.
+    # With PARALLEL_PLAN_DRAFT on, the migration plan is drafted from the static analysis
+    # alone at the same time, instead of waiting for the schema, and is reconciled with the
+    # final schema in step 3.
     schema_validator = SchemaValidator(llm_client)
-    schema_validation_report = schema_validator.validate_schema(schema_suggestion, parsed_classes)
+    schema_validator.prepare(parsed_classes)
+
+    async def stream_schema():
+        """Streams the schema suggestion, echoing it to stdout, returning it with its validation report."""
+        chunks = suggester.asuggest_schema_stream(parsed_classes)
+        if not echo:
+            schema, report = await schema_validator.avalidate_stream(chunks)
+            print(f"\n=== Schema Suggestion ===\n{schema}")
+            return schema, report
+
+        print("\n=== Schema Suggestion ===")
+        return await schema_validator.avalidate_stream(_echo_stream(chunks))
+
+    plan_draft = None
+    if _env_flag("PARALLEL_PLAN_DRAFT"):
+        (schema_suggestion, schema_validation_report), plan_draft = await asyncio.gather(
+            _bounded(semaphore, stream_schema()),
+            draft_plan(),
+        )
+    else:
+        schema_suggestion, schema_validation_report = await stream_schema()
     print("\n=== Schema Validation ===")
     print(schema_validation_report)
 
     if schema_validation_report["status"] != "PASS":
+        # With SCHEMA_REVISION_CANDIDATES above 1, several revisions are sampled concurrently and
+        # the first one that passes validation is kept
         logger.info("Schema validation issues found, requesting revision from LLM...")
-        schema_suggestion = suggester.revise_schema_with_feedback(
-            original_schema=schema_suggestion,
-            issues=schema_validation_report.get("issues", "No issues provided."),
-            parsed_classes=parsed_classes
+        sampling = {"temperature": CANDIDATE_TEMPERATURE} if schema_candidates > 1 else {}
+        issues = schema_validation_report.get("issues", "No issues provided.")
+        revised_schemas = await suggester.arevise_schema_with_feedback_batch(
+            [(schema_suggestion, issues)] * schema_candidates,
+            parsed_classes,
+            semaphore,
+            **sampling
         )
+        revision_reports = [schema_validator.validate_schema(schema) for schema in revised_schemas]
+        best = next((i for i, report in enumerate(revision_reports) if report["status"] == "PASS"), 0)
+        schema_suggestion, schema_validation_report = revised_schemas[best], revision_reports[best]
         print("\n=== Revised Schema Suggestion ===")
         print(schema_suggestion)
 
-        schema_validation_report = schema_validator.validate_schema(schema_suggestion, parsed_classes)
         print("\n=== Re-Validated Schema Report ===")
         print(schema_validation_report)
 
-    # Step 3: Generate migration plan
-    plan_generator = MigrationPlanGenerator(llm_client)
-    plan = plan_generator.generate_plan(parsed_classes, schema_suggestion=schema_suggestion)
+    # Step 3: Generate migration plan, or reconcile the one drafted alongside the schema with it
+    if plan_draft is not None:
+        plan, self_score = await plan_generator.areconcile_plan_with_schema(
+            parsed_classes, plan_draft[0], schema_suggestion, self_check=self_check_threshold is not None
+        )
+    else:
+        plan, self_score = await draft_plan(schema_suggestion)
     print("\n=== Migration Plan ===")
     print(plan)
 
     # Step 4: Validate migration plan
-    plan_validator = MigrationPlanValidator(llm_client)
-    validation_report = plan_validator.validate_plan(plan, parsed_classes)
+    plan_validator = MigrationPlanValidator(llm_client, model=os.getenv("VALIDATOR_MODEL"))
+    if self_score is not None and self_score >= self_check_threshold:
+        logger.info(f"Plan self-check scored {self_score}; skipping initial validation.")
+        validation_report = {"valid": True, "issues": []}
+    else:
+        validation_report = await plan_validator.avalidate_plan(plan, parsed_classes)
     print("\n=== Plan Validation ===")
     print(validation_report)
 
-    # Retry plan revision up to MAX_RETRIES if needed
-    max_retries = int(os.getenv("MAX_RETRIES", 3))
+    # Retry plan revision up to MAX_RETRIES if needed, optionally drafting several candidate
+    # revisions per attempt and keeping the first one that validates
     retries = 0
+    parsed_info_str = None
 
     while not validation_report.get("valid", False) and retries < max_retries:
         logger.info(f"Migration plan validation failed. Attempting revision (try {retries + 1}/{max_retries})...")
 
-        parsed_info_str = "\n".join(
-            f"Class: {cls.get('name', 'Unknown')} ({cls.get('type', 'Unknown')})\n" +
-            "\n".join(f"  - {f['name']}: {f.get('type', 'unknown')}" for f in cls.get("fields", []))
-            for cls in parsed_classes
-        )
-
         issues_list = validation_report.get("issues", [])
         issues_text = "; ".join(
-            f"{issue['issue']}: {issue.get('detail', '')}" for issue in issues_list
+            f"{issue.get('issue', '')}: {issue.get('detail', '')}" if isinstance(issue, dict) else str(issue)
+            for issue in issues_list
         ) if issues_list else "No details provided."
 
-        # Revise the plan
-        plan = plan_generator.revise_plan_with_feedback(
-            migration_plan=plan,
-            issues=issues_text,
-            parsed_info=parsed_info_str
-        )
-        print(f"\n=== Revised Migration Plan (Attempt {retries + 1}) ===")
-        print(plan)
+        # Built on the first revision only, since a plan that validates needs none; the parsed
+        # classes do not change between revisions, and this reuses the plan generator's summary,
+        # condensed if the codebase is large
+        if parsed_info_str is None:
+            parsed_info_str = await plan_generator.astatic_analysis(parsed_classes)
+
+        # Revise the plan; the final revision is not validated, so only one is drafted for it
+        will_validate = retries + 1 < max_retries
+        num_candidates = candidates_per_attempt if will_validate else 1
+        sampling = {"temperature": CANDIDATE_TEMPERATURE} if num_candidates > 1 else {}
+        candidates = await asyncio.gather(*(
+            plan_generator.arevise_plan_with_feedback(
+                migration_plan=plan,
+                issues=issues_text,
+                parsed_info=parsed_info_str,
+                **sampling
+            )
+            for _ in range(num_candidates)
+        ))
 
         retries += 1
 
-        if retries < max_retries:
-            validation_report = plan_validator.validate_plan(plan, parsed_classes)
+        if will_validate:
+            plan, validation_report = await _first_valid_plan(candidates, plan_validator, parsed_classes, semaphore)
+            print(f"\n=== Revised Migration Plan (Attempt {retries}) ===")
+            print(plan)
             print(f"\n=== Re-Validated Plan Report (Attempt {retries}) ===")
             print(validation_report)
         else:
+            plan = candidates[0]
+            print(f"\n=== Revised Migration Plan (Attempt {retries}) ===")
+            print(plan)
             logger.info("Max retries reached. Skipping final validation.")
             break
 
     if not validation_report.get("valid", False):
         logger.warning(f"Migration plan could not be validated after {max_retries} attempts. Proceeding with last revision.")
 
+    # Release pooled connections while the event loop that opened them is still running
+    await llm_client.aclose()
+
     # Save results
     os.makedirs("results", exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    try:
-        with open(f"results/schema_suggestion_{timestamp}.md", "w", encoding="utf-8") as f:
-            f.write(schema_suggestion)
-        logger.info("Saved schema suggestion.")
-    except Exception as e:
-        logger.error(f"Failed to save schema suggestion: {e}")
+    results = (
+        ("schema suggestion", f"results/{result_prefix}schema_suggestion_{timestamp}.md", schema_suggestion),
+        ("migration plan", f"results/{result_prefix}migration_plan_{timestamp}.md", plan),
+    )
+    for label, result_path, content in results:
+        try:
+            _write_result(result_path, content)
+            logger.info(f"Saved {label}.")
+        except Exception as e:
+            logger.error(f"Failed to save {label}: {e}")
+
+    logger.info("Full migration pipeline completed.")
 
+
+def _migrate_project(path: str, force_refresh: bool, parse_workers: int) -> bool:
+    """
+    Runs the full pipeline for one project in a worker process, saving its results under the
+    project's directory name and parsing with at most parse_workers processes. Returns whether
+    the pipeline completed.
+    Module-level so it can be dispatched to worker processes.
+    """
+    project = os.path.basename(os.path.normpath(path))
     try:
-        with open(f"results/migration_plan_{timestamp}.md", "w", encoding="utf-8") as f:
-            f.write(plan)
-        logger.info("Saved migration plan.")
+        asyncio.run(full_migrate_command(
+            path,
+            force_refresh=force_refresh,
+            result_prefix=f"{project}_",
+            parse_workers=parse_workers,
+            echo=False
+        ))
+    except SystemExit:
+        return False
     except Exception as e:
-        logger.error(f"Failed to save migration plan: {e}")
+        logger.error(f"Migration pipeline failed for {path}: {e}")
+        return False
+    return True
 
-    logger.info("Full migration pipeline completed.")
+
+def migrate_projects(paths, force_refresh: bool = False) -> bool:
+    """
+    Runs the full pipeline for several independent projects, one worker process per project
+    up to the number of CPUs. Within each project, LLM requests still share an event loop, and
+    the CPUs are divided between the projects for parsing.
+
+    Args:
+        paths: Root directories of the projects' Java source code.
+        force_refresh: Ignore cached LLM responses instead of reusing them.
+
+    Returns:
+        True if every project's pipeline completed.
+    """
+    cpus = os.cpu_count() or 1
+    workers = min(len(paths), cpus)
+    parse_workers = max(1, cpus // workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        completed = list(executor.map(
+            _migrate_project, paths, [force_refresh] * len(paths), [parse_workers] * len(paths)
+        ))
+
+    for path, ok in zip(paths, completed):
+        if not ok:
+            logger.error(f"Migration pipeline did not complete for {path}")
+    return all(completed)
 
 
 def main():
     parser = argparse.ArgumentParser(description="Java to MongoDB Migration CLI")
-    parser.add_argument("path", help="Root directory of Java source code")
+    parser.add_argument("paths", nargs="+", metavar="path", help="Root directory of Java source code; several projects may be given")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached LLM responses and query the model again")
     args = parser.parse_args()
 
-    full_migrate_command(args.path)
+    if len(args.paths) == 1:
+        asyncio.run(full_migrate_command(args.paths[0], force_refresh=args.refresh))
+    elif not migrate_projects(args.paths, force_refresh=args.refresh):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,47 +1,107 @@
-from typing import List, Dict, Any, Optional
+import asyncio
+import re
+from typing import Dict, List, Optional, Tuple
+from analyzer.models import ParsedClass, ParsedClassLike, coerce_parsed_classes
+from analyzer.summary import details_summary
 from llm.llm_client import LLMClient
-from llm.prompt_templates import MIGRATION_PLAN_PROMPT, PLAN_REVISION_FEEDBACK_PROMPT
+from llm.prompt_templates import (
+    CLASS_GROUP_SUMMARY_PROMPT,
+    MIGRATION_PLAN_PROMPT,
+    PLAN_REQUEST,
+    PLAN_REVISION_FEEDBACK_PROMPT,
+    PLAN_SCHEMA_RECONCILE_PROMPT,
+    PLAN_SCHEMA_SUGGESTION_PROMPT,
+    PLAN_SELF_CHECK_INSTRUCTION,
+)
+
+# Trailing self-assessment line requested by PLAN_SELF_CHECK_INSTRUCTION
+SELF_CHECK_PATTERN = re.compile(r"^\W*SELF_CHECK\W*(\d{1,3})\W*\Z", re.MULTILINE)
 
 
 class MigrationPlanGenerator:
     """
     Uses an LLM to generate a step-by-step migration plan from Java to MongoDB.
+
+    When the static analysis summary of a large codebase exceeds SUMMARY_CHAR_LIMIT, the classes
+    are split into groups of SUMMARY_GROUP_SIZE, each group is condensed by the LLM (concurrently
+    in the async methods, within the shared semaphore's limit or else at most
+    SUMMARY_MAX_CONCURRENCY at once), and the plan is generated from the condensed summaries.
     """
 
-    def __init__(self, llm_client: LLMClient):
+    SUMMARY_CHAR_LIMIT = 8000
+    SUMMARY_GROUP_SIZE = 20
+    SUMMARY_MAX_CONCURRENCY = 4
+
+    def __init__(self, llm_client: LLMClient, semaphore: Optional[asyncio.Semaphore] = None):
+        """
+        Initialize with an LLM client and, optionally, the semaphore that caps concurrent LLM
+        requests across the pipeline; each async request holds it only while it is in flight.
+        """
         self.llm_client = llm_client
+        self.semaphore = semaphore
+        # Condensed summaries by full summary text, so each codebase is condensed once
+        self._condensed: Dict[str, str] = {}
 
-    def generate_plan(self, parsed_classes: List[Dict[str, Any]], schema_suggestion: Optional[str] = None) -> str:
+    def generate_plan(self, parsed_classes: List[ParsedClassLike], schema_suggestion: Optional[str] = None) -> str:
         """
         Generates a migration plan from the parsed Java classes.
 
         Args:
-            parsed_classes (List[Dict[str, Any]]): Parsed class metadata from Java source code.
+            parsed_classes (List[ParsedClassLike]): Parsed class metadata from Java source code.
             schema_suggestion (Optional[str]): Suggested MongoDB schema to inform migration plan.
 
         Returns:
             str: LLM-generated migration plan text.
         """
-        if not parsed_classes:
-            raise ValueError("No parsed Java classes provided.")
+        static_analysis = self.static_analysis(parsed_classes)
+        system, prompt = self._plan_messages(static_analysis, schema_suggestion)
 
-        static_analysis_summary = "\n".join(
-            f"Class: {cls.get('name', 'Unknown')} ({cls.get('type', 'Unknown')})\n" +
-            "\n".join(f"  - {f['name']}: {f.get('type', 'unknown')}" for f in cls.get("fields", []))
-            for cls in parsed_classes
-        )
+        # Query the LLM
+        response = self.llm_client.generate(prompt, system=system)
 
-        # Optionally append schema suggestion to static analysis summary for more context
-        if schema_suggestion:
-            static_analysis_summary += "\n\nMongoDB Schema Suggestion:\n" + schema_suggestion
+        return response
 
-        # Construct prompt with the combined summary
-        prompt = MIGRATION_PLAN_PROMPT.format(static_analysis=static_analysis_summary)
+    async def agenerate_plan(self, parsed_classes: List[ParsedClassLike], schema_suggestion: Optional[str] = None) -> str:
+        """
+        Async variant of generate_plan.
+        """
+        static_analysis = await self.astatic_analysis(parsed_classes)
+        system, prompt = self._plan_messages(static_analysis, schema_suggestion)
+        return await self._agenerate(prompt, system=system)
 
-        # Query the LLM
-        response = self.llm_client.generate(prompt)
+    def generate_plan_with_self_check(
+        self,
+        parsed_classes: List[ParsedClassLike],
+        schema_suggestion: Optional[str] = None
+    ) -> Tuple[str, Optional[int]]:
+        """
+        Generates a migration plan and asks the LLM to score its own coverage of the static analysis.
 
-        return response
+        Args:
+            parsed_classes (List[ParsedClassLike]): Parsed class metadata from Java source code.
+            schema_suggestion (Optional[str]): Suggested MongoDB schema to inform migration plan.
+
+        Returns:
+            Tuple[str, Optional[int]]: The plan with the self-check line removed, and the 0-100
+            self-check score, or None if the response did not include one.
+        """
+        static_analysis = self.static_analysis(parsed_classes)
+        system, prompt = self._plan_messages(static_analysis, schema_suggestion, self_check=True)
+        response = self.llm_client.generate(prompt, system=system)
+        return self._split_self_check(response)
+
+    async def agenerate_plan_with_self_check(
+        self,
+        parsed_classes: List[ParsedClassLike],
+        schema_suggestion: Optional[str] = None
+    ) -> Tuple[str, Optional[int]]:
+        """
+        Async variant of generate_plan_with_self_check.
+        """
+        static_analysis = await self.astatic_analysis(parsed_classes)
+        system, prompt = self._plan_messages(static_analysis, schema_suggestion, self_check=True)
+        response = await self._agenerate(prompt, system=system)
+        return self._split_self_check(response)
 
     def revise_plan_with_feedback(self, migration_plan: str, issues: str, parsed_info: str) -> str:
         """
@@ -55,10 +115,187 @@ class MigrationPlanGenerator:
         Returns:
             str: A revised migration plan generated by the LLM.
         """
-        prompt = PLAN_REVISION_FEEDBACK_PROMPT.format(
+        prompt = self._revision_prompt(migration_plan, issues, parsed_info)
+        revised_plan = self.llm_client.generate(prompt)
+        return revised_plan
+
+    async def arevise_plan_with_feedback(self, migration_plan: str, issues: str, parsed_info: str, **kwargs) -> str:
+        """
+        Async variant of revise_plan_with_feedback. Additional keyword arguments, such as a
+        sampling temperature, are passed through to the LLM client.
+        """
+        prompt = self._revision_prompt(migration_plan, issues, parsed_info)
+        return await self._agenerate(prompt, **kwargs)
+
+    def reconcile_plan_with_schema(
+        self,
+        parsed_classes: List[ParsedClassLike],
+        migration_plan: str,
+        schema_suggestion: str,
+        self_check: bool = False
+    ) -> Tuple[str, Optional[int]]:
+        """
+        Revises a plan drafted without the schema suggestion so that it is consistent with it.
+
+        Args:
+            parsed_classes (List[ParsedClassLike]): Parsed class metadata the plan was drafted from.
+            migration_plan (str): The plan drafted without the schema suggestion.
+            schema_suggestion (str): Suggested MongoDB schema the plan should follow.
+            self_check (bool): Whether to ask the LLM to score the revised plan, as in
+                generate_plan_with_self_check.
+
+        Returns:
+            Tuple[str, Optional[int]]: The revised plan, and its self-check score, or None if
+            self_check is off or the response did not include one.
+        """
+        static_analysis = self.static_analysis(parsed_classes)
+        system, prompt = self._reconcile_messages(static_analysis, migration_plan, schema_suggestion, self_check)
+        response = self.llm_client.generate(prompt, system=system)
+        return self._split_self_check(response) if self_check else (response, None)
+
+    async def areconcile_plan_with_schema(
+        self,
+        parsed_classes: List[ParsedClassLike],
+        migration_plan: str,
+        schema_suggestion: str,
+        self_check: bool = False
+    ) -> Tuple[str, Optional[int]]:
+        """
+        Async variant of reconcile_plan_with_schema.
+        """
+        static_analysis = await self.astatic_analysis(parsed_classes)
+        system, prompt = self._reconcile_messages(static_analysis, migration_plan, schema_suggestion, self_check)
+        response = await self._agenerate(prompt, system=system)
+        return self._split_self_check(response) if self_check else (response, None)
+
+    def static_analysis(self, parsed_classes: List[ParsedClassLike]) -> str:
+        """
+        Returns the static analysis summary the plan is generated from, condensing it group by
+        group when it is longer than SUMMARY_CHAR_LIMIT.
+        """
+        classes, summary = self._full_summary(parsed_classes)
+        if len(summary) <= self.SUMMARY_CHAR_LIMIT:
+            return summary
+
+        if summary not in self._condensed:
+            self._condensed[summary] = "\n\n".join(
+                self.llm_client.generate(self._group_summary_prompt(group)) for group in self._groups(classes)
+            )
+        return self._condensed[summary]
+
+    async def astatic_analysis(self, parsed_classes: List[ParsedClassLike]) -> str:
+        """
+        Async variant of static_analysis; the groups are condensed concurrently.
+        """
+        classes, summary = self._full_summary(parsed_classes)
+        if len(summary) <= self.SUMMARY_CHAR_LIMIT:
+            return summary
+
+        if summary not in self._condensed:
+            semaphore = self.semaphore
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.SUMMARY_MAX_CONCURRENCY)
+
+            async def condense(group):
+                async with semaphore:
+                    return await self.llm_client.agenerate(self._group_summary_prompt(group))
+
+            group_summaries = await asyncio.gather(*(condense(group) for group in self._groups(classes)))
+            self._condensed[summary] = "\n\n".join(group_summaries)
+        return self._condensed[summary]
+
+    async def _agenerate(self, prompt: str, **kwargs) -> str:
+        """
+        Sends one async LLM request, holding the shared semaphore while it is in flight.
+        """
+        if self.semaphore is None:
+            return await self.llm_client.agenerate(prompt, **kwargs)
+        async with self.semaphore:
+            return await self.llm_client.agenerate(prompt, **kwargs)
+
+    def _full_summary(self, parsed_classes: List[ParsedClassLike]) -> Tuple[List[ParsedClass], str]:
+        """
+        Returns the coerced parsed classes and their full detailed summary.
+        """
+        if not parsed_classes:
+            raise ValueError("No parsed Java classes provided.")
+
+        classes = coerce_parsed_classes(parsed_classes)
+        return classes, details_summary(classes)
+
+    def _groups(self, classes: List[ParsedClass]) -> List[List[ParsedClass]]:
+        """
+        Splits the classes into consecutive groups of SUMMARY_GROUP_SIZE.
+        """
+        size = self.SUMMARY_GROUP_SIZE
+        return [classes[i:i + size] for i in range(0, len(classes), size)]
+
+    def _group_summary_prompt(self, group: List[ParsedClass]) -> str:
+        """
+        Builds the prompt that condenses the summary of one group of classes.
+        """
+        return CLASS_GROUP_SUMMARY_PROMPT.format(static_analysis=details_summary(group, cache=False))
+
+    def _plan_messages(
+        self,
+        static_analysis: str,
+        schema_suggestion: Optional[str],
+        self_check: bool = False
+    ) -> Tuple[str, str]:
+        """
+        Builds the migration plan prompt as a (system, user) pair, optionally asking for a trailing
+        self-check score.
+
+        The system message holds the instructions and static analysis summary, which stay the same
+        for unchanged parsed classes, so the provider can serve that prefix from its prompt cache.
+        The schema suggestion and other per-request text go in the user message after it.
+        """
+        system = MIGRATION_PLAN_PROMPT.format(static_analysis=static_analysis)
+
+        # Optionally include the schema suggestion for more context
+        if schema_suggestion:
+            prompt = PLAN_SCHEMA_SUGGESTION_PROMPT.format(schema_suggestion=schema_suggestion)
+        else:
+            prompt = PLAN_REQUEST
+        if self_check:
+            prompt += PLAN_SELF_CHECK_INSTRUCTION
+        return system, prompt
+
+    def _reconcile_messages(
+        self,
+        static_analysis: str,
+        migration_plan: str,
+        schema_suggestion: str,
+        self_check: bool
+    ) -> Tuple[str, str]:
+        """
+        Builds the plan reconciliation prompt as a (system, user) pair, sharing the plan prompt's
+        system message so its cached prefix is reused.
+        """
+        system = MIGRATION_PLAN_PROMPT.format(static_analysis=static_analysis)
+        prompt = PLAN_SCHEMA_RECONCILE_PROMPT.format(
+            migration_plan=migration_plan,
+            schema_suggestion=schema_suggestion
+        )
+        if self_check:
+            prompt += PLAN_SELF_CHECK_INSTRUCTION
+        return system, prompt
+
+    def _split_self_check(self, response: str) -> Tuple[str, Optional[int]]:
+        """
+        Separates the trailing SELF_CHECK line from a plan response.
+        """
+        match = SELF_CHECK_PATTERN.search(response.rstrip())
+        if match is None:
+            return response, None
+        return response[:match.start()].rstrip(), min(int(match.group(1)), 100)
+
+    def _revision_prompt(self, migration_plan: str, issues: str, parsed_info: str) -> str:
+        """
+        Builds the plan revision prompt from the current plan and its validation issues.
+        """
+        return PLAN_REVISION_FEEDBACK_PROMPT.format(
             migration_plan=migration_plan,
             issues=issues,
             parsed_info=parsed_info
         )
-        revised_plan = self.llm_client.generate(prompt)
-        return revised_plan
@@ -1,4 +1,7 @@
-from typing import List, Dict, Any
+import json
+from typing import List, Dict, Any, Optional
+from analyzer.models import ParsedClassLike, coerce_parsed_classes
+from analyzer.summary import fields_summary
 from llm.llm_client import LLMClient
 from llm.prompt_templates import VALIDATION_PROMPT_TEMPLATE
 
@@ -8,8 +11,13 @@ class MigrationPlanValidator:
     Validates the completeness and accuracy of a migration plan generated by the LLM.
     """
 
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, model: Optional[str] = None):
+        """
+        Initialize with an LLM client. Validation is a narrower task than planning, so a smaller,
+        cheaper model may be given to use instead of the client's model.
+        """
         self.llm_client = llm_client
+        self.model = model
 
     def _clean_response(self, response: str) -> str:
         """
@@ -27,41 +35,61 @@ class MigrationPlanValidator:
             response = "\n".join(lines)
         return response.strip()
 
-    def validate_plan(self, migration_plan: str, parsed_classes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def validate_plan(self, migration_plan: str, parsed_classes: List[ParsedClassLike]) -> Dict[str, Any]:
         """
         Sends the migration plan and parsed Java class details to the LLM for validation.
         Returns a structured report indicating whether the plan is complete and highlighting any issues.
         """
+        prompt = self._validation_prompt(migration_plan, parsed_classes)
+        validation_response = self.llm_client.generate(prompt, model=self.model, cacheable=self._is_report)
+        return self._parse_report(validation_response)
+
+    async def avalidate_plan(self, migration_plan: str, parsed_classes: List[ParsedClassLike]) -> Dict[str, Any]:
+        """
+        Async variant of validate_plan.
+        """
+        prompt = self._validation_prompt(migration_plan, parsed_classes)
+        validation_response = await self.llm_client.agenerate(prompt, model=self.model, cacheable=self._is_report)
+        return self._parse_report(validation_response)
+
+    def _validation_prompt(self, migration_plan: str, parsed_classes: List[ParsedClassLike]) -> str:
+        """
+        Builds the validation prompt from the migration plan and a summary of the parsed classes.
+        """
         if not migration_plan:
             raise ValueError("Migration plan is empty.")
 
         if not parsed_classes:
             raise ValueError("No parsed Java classes provided for validation.")
 
-        parsed_info_lines = []
-        for cls in parsed_classes:
-            name = cls.get("name", "UnknownClass")
-            fields = cls.get("fields", [])
-            if fields:
-                fields_str = ", ".join(f"{f['name']}:{f.get('type', 'unknown')}" for f in fields)
-            else:
-                fields_str = "No fields"
-            parsed_info_lines.append(f"Class: {name}, Fields: {fields_str}")
-        parsed_info_str = "\n".join(parsed_info_lines)
-
-        prompt = VALIDATION_PROMPT_TEMPLATE.format(
+        return VALIDATION_PROMPT_TEMPLATE.format(
             migration_plan=migration_plan,
-            parsed_info=parsed_info_str
+            parsed_info=fields_summary(coerce_parsed_classes(parsed_classes))
         )
 
-        validation_response = self.llm_client.generate(prompt)
+    def _load_report(self, validation_response: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the LLM's JSON validation report, or None if the response is not a JSON object.
+        """
+        try:
+            validation_report = json.loads(self._clean_response(validation_response))
+        except ValueError:
+            return None
+        return validation_report if isinstance(validation_report, dict) else None
 
-        cleaned_response = self._clean_response(validation_response)
+    def _is_report(self, validation_response: str) -> bool:
+        """
+        Returns whether a validation response parses as a report; others are not cached, so a
+        malformed response is not replayed on later runs.
+        """
+        return self._load_report(validation_response) is not None
 
-        try:
-            import json
-            validation_report = json.loads(cleaned_response)
-        except Exception:
+    def _parse_report(self, validation_response: str) -> Dict[str, Any]:
+        """
+        Parses the LLM's JSON validation report, falling back to an invalid report if it cannot be parsed.
+        """
+        validation_report = self._load_report(validation_response)
+        if validation_report is None:
             validation_report = {
                 "valid": False,
                 "issues": ["Failed to parse validation response."],
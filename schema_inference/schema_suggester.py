@@ -1,6 +1,14 @@
-from typing import List, Dict, Any
+import asyncio
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from analyzer.models import ParsedClassLike, coerce_parsed_classes
+from analyzer.summary import fields_summary
 from llm.llm_client import LLMClient
-from llm.prompt_templates import SCHEMA_SUGGESTION_PROMPT, SCHEMA_REVISION_PROMPT
+from llm.prompt_templates import (
+    SCHEMA_REVISION_FEEDBACK_PROMPT,
+    SCHEMA_REVISION_PROMPT,
+    SCHEMA_SUGGESTION_PROMPT,
+    SCHEMA_SUGGESTION_REQUEST,
+)
 
 
 class SchemaSuggester:
@@ -15,47 +23,117 @@ class SchemaSuggester:
         """
         self.llm_client = llm_client
 
-    def suggest_schema(self, parsed_classes: List[Dict[str, Any]]) -> str:
+    def suggest_schema(self, parsed_classes: List[ParsedClassLike]) -> str:
         """
         Generate a MongoDB schema suggestion from parsed Java classes.
         """
-        if not parsed_classes:
-            raise ValueError("No parsed Java classes provided.")
+        system = self._suggestion_prompt(parsed_classes)
+        response = self.llm_client.generate(SCHEMA_SUGGESTION_REQUEST, system=system)
+        return response
 
-        static_analysis_summary = self._format_parsed_classes(parsed_classes)
-        prompt = SCHEMA_SUGGESTION_PROMPT.format(static_analysis=static_analysis_summary)
+    async def asuggest_schema(self, parsed_classes: List[ParsedClassLike]) -> str:
+        """
+        Async variant of suggest_schema.
+        """
+        system = self._suggestion_prompt(parsed_classes)
+        return await self.llm_client.agenerate(SCHEMA_SUGGESTION_REQUEST, system=system)
 
-        response = self.llm_client.generate(prompt)
-        return response
+    def suggest_schema_stream(self, parsed_classes: List[ParsedClassLike]) -> Iterator[str]:
+        """
+        Streaming variant of suggest_schema, yielding the suggestion in pieces as it is generated.
+        """
+        system = self._suggestion_prompt(parsed_classes)
+        return self.llm_client.generate_stream(SCHEMA_SUGGESTION_REQUEST, system=system)
+
+    def asuggest_schema_stream(self, parsed_classes: List[ParsedClassLike]) -> AsyncIterator[str]:
+        """
+        Async variant of suggest_schema_stream.
+        """
+        system = self._suggestion_prompt(parsed_classes)
+        return self.llm_client.agenerate_stream(SCHEMA_SUGGESTION_REQUEST, system=system)
 
     def revise_schema_with_feedback(
         self,
         original_schema: str,
         issues: str,
-        parsed_classes: List[Dict[str, Any]]
+        parsed_classes: List[ParsedClassLike]
     ) -> str:
         """
         Use LLM to revise the schema suggestion based on validation issues and parsed classes context.
         """
+        system, prompt = self._revision_messages(original_schema, issues, parsed_classes)
+        revised_response = self.llm_client.generate(prompt, system=system)
+        return revised_response
+
+    async def arevise_schema_with_feedback(
+        self,
+        original_schema: str,
+        issues: str,
+        parsed_classes: List[ParsedClassLike],
+        **kwargs
+    ) -> str:
+        """
+        Async variant of revise_schema_with_feedback. Additional keyword arguments, such as a
+        sampling temperature, are passed through to the LLM client.
+        """
+        system, prompt = self._revision_messages(original_schema, issues, parsed_classes)
+        return await self.llm_client.agenerate(prompt, system=system, **kwargs)
+
+    async def arevise_schema_with_feedback_batch(
+        self,
+        revisions: List[Tuple[str, str]],
+        parsed_classes: List[ParsedClassLike],
+        semaphore: Optional[asyncio.Semaphore] = None,
+        **kwargs
+    ) -> List[str]:
+        """
+        Revises several schemas concurrently, e.g. to sample candidate revisions of one schema.
+
+        Args:
+            revisions (List[Tuple[str, str]]): (original_schema, issues) pairs to revise.
+            parsed_classes (List[ParsedClassLike]): Parsed class metadata from Java source code.
+            semaphore (Optional[asyncio.Semaphore]): Caps the number of requests in flight at once.
+            **kwargs: Additional parameters passed through to the LLM client.
+
+        Returns:
+            List[str]: The revised schemas, in the order of the revisions.
+        """
+        async def revise(original_schema: str, issues: str) -> str:
+            if semaphore is None:
+                return await self.arevise_schema_with_feedback(original_schema, issues, parsed_classes, **kwargs)
+            async with semaphore:
+                return await self.arevise_schema_with_feedback(original_schema, issues, parsed_classes, **kwargs)
+
+        return list(await asyncio.gather(*(revise(schema, issues) for schema, issues in revisions)))
+
+    def _suggestion_prompt(self, parsed_classes: List[ParsedClassLike]) -> str:
+        """
+        Builds the schema suggestion system message, which holds the instructions and static
+        analysis summary so that it forms a stable, cacheable prompt prefix.
+        """
+        if not parsed_classes:
+            raise ValueError("No parsed Java classes provided.")
 
         static_analysis_summary = self._format_parsed_classes(parsed_classes)
-        prompt = SCHEMA_REVISION_PROMPT.format(
-            original_schema=original_schema,
-            issues=issues,
-            static_analysis=static_analysis_summary
-        )
+        return SCHEMA_SUGGESTION_PROMPT.format(static_analysis=static_analysis_summary)
 
-        revised_response = self.llm_client.generate(prompt)
-        return revised_response
+    def _revision_messages(
+        self,
+        original_schema: str,
+        issues: str,
+        parsed_classes: List[ParsedClassLike]
+    ) -> Tuple[str, str]:
+        """
+        Builds the schema revision prompt as a (system, user) pair: the static analysis summary
+        leads in the system message, and the original schema and its validation issues follow.
+        """
+        static_analysis_summary = self._format_parsed_classes(parsed_classes)
+        system = SCHEMA_REVISION_PROMPT.format(static_analysis=static_analysis_summary)
+        prompt = SCHEMA_REVISION_FEEDBACK_PROMPT.format(original_schema=original_schema, issues=issues)
+        return system, prompt
 
-    def _format_parsed_classes(self, parsed_classes: List[Dict[str, Any]]) -> str:
+    def _format_parsed_classes(self, parsed_classes: List[ParsedClassLike]) -> str:
         """
         Helper to create a summary string of parsed classes and their fields.
         """
-        lines = []
-        for cls in parsed_classes:
-            name = cls.get("name", "UnknownClass")
-            fields = cls.get("fields", [])
-            fields_str = ", ".join(f"{f['name']}:{f.get('type', 'unknown')}" for f in fields) if fields else "No fields"
-            lines.append(f"Class: {name}, Fields: {fields_str}")
-        return "\n".join(lines)
+        return fields_summary(coerce_parsed_classes(parsed_classes))
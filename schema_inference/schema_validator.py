@@ -1,4 +1,84 @@
-from typing import List, Dict
+import re
+from typing import AbstractSet, Any, AsyncIterable, FrozenSet, Iterable, List, Dict, Optional, Pattern, Set, Tuple
+from analyzer.models import ParsedClass, ParsedClassLike, coerce_parsed_classes
+
+
+def _alternation(tokens: Iterable[str]) -> Pattern[str]:
+    """
+    Compiles a case-insensitive pattern that finds, at every position of the text, the longest of
+    the given literal tokens starting there; matches may overlap, and findall returns them.
+
+    The alternation is factored by common prefixes, so at each position of the text the regex
+    engine follows one branch per distinct next character instead of trying every token in turn.
+    """
+    trie: Dict[str, Any] = {}
+    for token in tokens:
+        if not token:
+            continue
+        node = trie
+        for char in token:
+            node = node.setdefault(char, {})
+        node[""] = None
+    return re.compile("(?=(" + _trie_regex(trie) + "))", re.IGNORECASE)
+
+
+def _trie_regex(node: Dict[str, Any]) -> str:
+    """
+    Returns the regex for a prefix trie node; the "" key marks the end of a token.
+    """
+    branches = [re.escape(char) + _trie_regex(child) for char, child in node.items() if char]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return "(?:" + body + ")?" if "" in node else body
+
+
+def _find_tokens(pattern: Pattern[str], tokens: AbstractSet[str], text: str) -> Set[str]:
+    """
+    Returns the (lowercased) tokens that occur in the text in any case, using a single
+    case-insensitive pass of a pattern built by _alternation over it.
+
+    The pass finds the longest token at each position, so a token that only occurs as the
+    start of a longer one is not matched itself; it is found among the prefixes of the
+    matched tokens instead of by searching the text again.
+    """
+    found = {match.lower() for match in pattern.findall(text)}
+    prefixes = {token[:i] for token in found for i in range(1, len(token))}
+    found.update(prefixes.intersection(tokens))
+    return found
+
+
+class _StreamScan:
+    """
+    Accumulates text that arrives in pieces, tracking which of a set of lowercased tokens
+    have not appeared in it yet. Each piece is scanned with the tokens' combined pattern.
+    """
+
+    def __init__(self, tokens: Set[str], pattern: Pattern[str]):
+        self.pending = set(tokens)
+        self._pattern = pattern
+        # Enough trailing text is kept to find a token split across two pieces
+        self._overlap = max(map(len, tokens), default=1) - 1
+        self._tail = ""
+        self._parts: List[str] = []
+
+    def feed(self, piece: str) -> None:
+        """
+        Adds the next piece of text and drops the tokens now seen from pending.
+        """
+        self._parts.append(piece)
+        if not self.pending:
+            return
+        window = self._tail + piece
+        self.pending -= _find_tokens(self._pattern, self.pending, window)
+        self._tail = window[-self._overlap:] if self._overlap else ""
+
+    def text(self) -> str:
+        """
+        Returns all text fed so far.
+        """
+        return "".join(self._parts)
+
 
 class SchemaValidator:
     """
@@ -6,45 +86,145 @@ class SchemaValidator:
     """
 
     REQUIRED_KEYWORDS = ["_id", "type", "fields", "relationships"]
+    KEYWORD_PATTERN = _alternation(REQUIRED_KEYWORDS)
 
     def __init__(self, llm_client):
         """
         Initialize with an LLM client for schema validation.
         """
         self.llm_client = llm_client
+        # The parsed classes last prepared or validated against, with their class names and token
+        # pattern; the same list is revalidated after each schema revision
+        self._class_cache: Optional[Tuple[List[Any], FrozenSet[str], Pattern[str]]] = None
+
+    def prepare(self, parsed_classes: List[ParsedClassLike]) -> None:
+        """
+        Precomputes the class names and token pattern for the parsed classes, so that later
+        validations can omit them. The list must not be modified while it is in use.
+        """
+        self._class_tokens(parsed_classes)
 
-    def validate_schema(self, schema_text: str, parsed_classes: List[Dict]) -> Dict[str, str]:
+    def validate_schema(self, schema_text: str, parsed_classes: Optional[List[ParsedClassLike]] = None) -> Dict[str, str]:
         """
         Validates the schema suggestion returned by the LLM.
 
         Args:
             schema_text (str): The suggested schema text from the LLM.
-            parsed_classes (List[Dict]): Parsed Java class metadata.
+            parsed_classes (Optional[List[ParsedClassLike]]): Parsed Java class metadata; defaults to the
+                classes passed to prepare().
 
         Returns:
             Dict[str, str]: A dictionary with validation status and any issues found.
         """
-        results = {
-            "status": "PASS",
-            "issues": ""
-        }
+        if not schema_text or schema_text.isspace():
+            return self._empty_report()
 
-        if not schema_text or len(schema_text.strip()) == 0:
-            results["status"] = "FAIL"
-            results["issues"] = "Schema suggestion is empty."
-            return results
+        # Keywords and class names are found together in a single case-insensitive scan of the
+        # schema, without making a lowercased copy of it
+        class_names, token_pattern = self._class_tokens(parsed_classes)
+        found = _find_tokens(token_pattern, class_names.union(self.REQUIRED_KEYWORDS), schema_text)
+        missing_keywords = [kw for kw in self.REQUIRED_KEYWORDS if kw not in found]
 
-        missing_keywords = [kw for kw in self.REQUIRED_KEYWORDS if kw not in schema_text.lower()]
-        if missing_keywords:
-            results["status"] = "WARN"
-            results["issues"] += f"Missing keywords: {', '.join(missing_keywords)}. "
+        return self._report(missing_keywords, class_names - found)
+
+    def validate_stream(
+        self,
+        chunks: Iterable[str],
+        parsed_classes: Optional[List[ParsedClassLike]] = None
+    ) -> Tuple[str, Dict[str, str]]:
+        """
+        Validates a schema suggestion while it is still being streamed from the LLM, checking
+        each piece as it arrives so the report is ready as soon as the stream ends.
+
+        Args:
+            chunks (Iterable[str]): Pieces of the suggested schema text, in order.
+            parsed_classes (Optional[List[ParsedClassLike]]): Parsed Java class metadata; defaults to the
+                classes passed to prepare().
+
+        Returns:
+            Tuple[str, Dict[str, str]]: The complete schema text and the same report as validate_schema.
+        """
+        class_names, token_pattern = self._class_tokens(parsed_classes)
+        scan = _StreamScan(class_names.union(self.REQUIRED_KEYWORDS), token_pattern)
+        for chunk in chunks:
+            scan.feed(chunk)
+        return self._stream_report(scan, class_names)
+
+    async def avalidate_stream(
+        self,
+        chunks: AsyncIterable[str],
+        parsed_classes: Optional[List[ParsedClassLike]] = None
+    ) -> Tuple[str, Dict[str, str]]:
+        """
+        Async variant of validate_stream.
+        """
+        class_names, token_pattern = self._class_tokens(parsed_classes)
+        scan = _StreamScan(class_names.union(self.REQUIRED_KEYWORDS), token_pattern)
+        async for chunk in chunks:
+            scan.feed(chunk)
+        return self._stream_report(scan, class_names)
+
+    def _stream_report(self, scan: "_StreamScan", class_names: FrozenSet[str]) -> Tuple[str, Dict[str, str]]:
+        """
+        Builds the report for a completed stream from the tokens it never contained.
+        """
+        schema_text = scan.text().strip()
+        if not schema_text:
+            return schema_text, self._empty_report()
+
+        missing_keywords = [kw for kw in self.REQUIRED_KEYWORDS if kw in scan.pending]
+        return schema_text, self._report(missing_keywords, class_names & scan.pending)
+
+    def _class_tokens(self, parsed_classes: Optional[List[Any]]) -> Tuple[FrozenSet[str], Pattern[str]]:
+        """
+        Returns the lowercased class names the schema is expected to mention, and a pattern
+        matching any of them or any required keyword. Class names are taken from ParsedClass
+        entries, from class dictionaries as produced by JavaParser and from grouped entries of the
+        form {"classes": [...]}; entries without a name, such as parse errors, are skipped.
+
+        The result is reused while the same list is validated again, so it must not be
+        modified in between. Without parsed_classes, the last prepared or validated list is used.
+        """
+        if parsed_classes is None:
+            if self._class_cache is None:
+                raise ValueError("No parsed classes provided; pass them or call prepare() first.")
+            return self._class_cache[1], self._class_cache[2]
+        if self._class_cache is not None and self._class_cache[0] is parsed_classes:
+            return self._class_cache[1], self._class_cache[2]
+
+        names: List[str] = []
+        classes = []
+        for item in parsed_classes:
+            if isinstance(item, dict) and "classes" in item:
+                names.extend(cls['name'] for cls in item["classes"])
+            elif isinstance(item, ParsedClass) or (isinstance(item, dict) and "name" in item):
+                classes.append(item)
+        names.extend(cls.name for cls in coerce_parsed_classes(classes))
+        class_names = frozenset(name.lower() for name in names)
+        token_pattern = _alternation(class_names.union(self.REQUIRED_KEYWORDS)) if class_names else self.KEYWORD_PATTERN
+        self._class_cache = (parsed_classes, class_names, token_pattern)
+        return class_names, token_pattern
 
-        class_names = {cls['name'].lower() for item in parsed_classes for cls in item.get("classes", [])}
-        mentioned_classes = {name for name in class_names if name in schema_text.lower()}
+    def _empty_report(self) -> Dict[str, str]:
+        """
+        Returns the report for an empty schema suggestion.
+        """
+        return {
+            "status": "FAIL",
+            "issues": "Schema suggestion is empty."
+        }
 
-        missing_classes = class_names - mentioned_classes
+    def _report(self, missing_keywords: List[str], missing_classes: FrozenSet[str]) -> Dict[str, str]:
+        """
+        Builds the validation report from the keywords and class names missing from the schema.
+        """
+        issues: List[str] = []
+        if missing_keywords:
+            issues.append(f"Missing keywords: {', '.join(missing_keywords)}.")
         if missing_classes:
-            results["status"] = "WARN"
-            results["issues"] += f"Classes not mentioned in schema: {', '.join(missing_classes)}. "
+            issues.append(f"Classes not mentioned in schema: {', '.join(sorted(missing_classes))}.")
 
-        return results
+        return {
+            "status": "WARN" if issues else "PASS",
+            "issues": " ".join(issues)
+        }